@@ -5,10 +5,15 @@ name resolution when enabling #TranspileOptions.closure_target.
 
 import builtins
 import enum
+import functools
+import hashlib
+import importlib.util
+import marshal
+import os
 import sys
+import tempfile
 import types
 import typing as t
-from dataclasses import dataclass
 
 import typing_extensions as te
 
@@ -23,6 +28,11 @@ class NotSet(enum.Enum):
 
 undefined = NotSet.Value
 
+_getframe = sys._getframe
+
+#: The namespace of the #builtins module, which is the last resort when resolving a name in a #Closure.
+_BUILTINS: t.Dict[str, t.Any] = vars(builtins)
+
 
 class Context(te.Protocol):
     """
@@ -31,6 +41,8 @@ class Context(te.Protocol):
     that is used to get/set/delete variables.
     """
 
+    __slots__ = ()
+
     def __getitem__(self, key: str) -> t.Any:
         ...
 
@@ -40,10 +52,78 @@ class Context(te.Protocol):
     def __delitem__(self, key: str) -> None:
         ...
 
+    def _try_get(self, key: str) -> t.Any:
+        """
+        Returns the value for *key*, or #undefined if the context cannot resolve it. Contexts resolve names
+        through each other with this method to avoid raising and catching a #NameError for every context that
+        does not provide a name. Implementations should override this; the default implementation calls
+        #__getitem__() and catches the #NameError.
+        """
+
+        try:
+            return self[key]
+        except NameError:
+            return undefined
+
+    def _try_set(self, key: str, value: t.Any) -> bool:
+        """
+        Like #__setitem__(), but returns `False` instead of raising a #NameError if *key* cannot be resolved.
+        """
+
+        try:
+            self[key] = value
+        except NameError:
+            return False
+        return True
+
+    def _try_del(self, key: str) -> bool:
+        """
+        Like #__delitem__(), but returns `False` instead of raising a #NameError if *key* cannot be resolved.
+        """
+
+        try:
+            del self[key]
+        except NameError:
+            return False
+        return True
+
     def chain_with(self, other: "Context") -> "ChainContext":
         return ChainContext(self, other)
 
 
+class _ItemContext(Context):
+    """
+    Adapts an object that implements the #Context protocol without subclassing #Context (and thus lacks the
+    internal `_try_get()` family of methods) to a full #Context, based on its item methods and #NameError.
+    """
+
+    __slots__ = ("_target",)
+
+    def __init__(self, target: Context) -> None:
+        self._target = target
+
+    def __repr__(self) -> str:
+        return f"_ItemContext({self._target!r})"
+
+    def __getitem__(self, key: str) -> t.Any:
+        return self._target[key]
+
+    def __setitem__(self, key: str, value: t.Any) -> None:
+        self._target[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._target[key]
+
+
+def _as_context(context: Context) -> Context:
+    """
+    Wraps *context* in an #_ItemContext if it is not a subclass of #Context.
+    """
+
+    # NOTE: Checking for the `_try_get()` method instead would be fooled by proxies that implement `__getattr__()`.
+    return context if Context in type(context).__mro__ else _ItemContext(context)
+
+
 class ObjectContext(Context):
     """
     Proxies an object's members for get/set/delete operations of the dynamic name resolution.
@@ -52,6 +132,8 @@ class ObjectContext(Context):
     to be a method of the object.
     """
 
+    __slots__ = ("_target",)
+
     def __init__(self, target: t.Any) -> None:
         self._target = target
 
@@ -59,26 +141,43 @@ class ObjectContext(Context):
         raise NameError(f"object of type {type(self._target).__name__} does not have an attribute {key!r}")
 
     def __getitem__(self, key: str) -> t.Any:
-        value = getattr(self._target, key, undefined)
-        if value is not undefined:
-            return value
-        raise self._error(key)
+        value = self._try_get(key)
+        if value is undefined:
+            raise self._error(key)
+        return value
+
+    def _try_get(self, key: str) -> t.Any:
+        return getattr(self._target, key, undefined)
 
     def __setitem__(self, key: str, value: t.Any) -> None:
-        current = getattr(self._target, key, undefined)
-        if current is undefined:
+        if not self._try_set(key, value):
             raise self._error(key)
-        if isinstance(current, types.MethodType) and current.__self__ is current:
+
+    def _try_set(self, key: str, value: t.Any) -> bool:
+        target = self._target
+        current = getattr(target, key, undefined)
+        if current is undefined:
+            return False
+        # Instance and class methods of the target resolve to methods bound to the target or its type.
+        if isinstance(current, types.MethodType) and (current.__self__ is target or current.__self__ is type(target)):
             raise RuntimeError(f"cannot overwrite method {type(self._target).__name__}.{key}()")
-        setattr(self._target, key, value)
+        setattr(target, key, value)
+        return True
 
     def __delitem__(self, key: str) -> None:
-        current = getattr(self._target, key, undefined)
-        if current is undefined:
+        if not self._try_del(key):
             raise self._error(key)
-        if isinstance(current, types.MethodType) and current.__self__ is current:
+
+    def _try_del(self, key: str) -> bool:
+        target = self._target
+        current = getattr(target, key, undefined)
+        if current is undefined:
+            return False
+        # Instance and class methods of the target resolve to methods bound to the target or its type.
+        if isinstance(current, types.MethodType) and (current.__self__ is target or current.__self__ is type(target)):
             raise RuntimeError(f"cannot delete method {type(self._target).__name__}.{key}()")
-        delattr(self._target, key)
+        delattr(target, key)
+        return True
 
 
 class MapContext(Context):
@@ -86,6 +185,8 @@ class MapContext(Context):
     Delegates dynamic name resolution to a mapping.
     """
 
+    __slots__ = ("_target", "_description")
+
     def __init__(self, target: t.MutableMapping[str, t.Any], description: str) -> None:
         self._target = target
         self._description = description
@@ -98,17 +199,28 @@ class MapContext(Context):
             return self._target[key]
         raise self._error(key)
 
+    def _try_get(self, key: str) -> t.Any:
+        return self._target.get(key, undefined)
+
     def __setitem__(self, key: str, value: t.Any) -> None:
+        if not self._try_set(key, value):
+            raise self._error(key)
+
+    def _try_set(self, key: str, value: t.Any) -> bool:
         if key in self._target:
             self._target[key] = value
-        else:
-            raise self._error(key)
+            return True
+        return False
 
     def __delitem__(self, key: str) -> None:
+        if not self._try_del(key):
+            raise self._error(key)
+
+    def _try_del(self, key: str) -> bool:
         if key in self._target:
             del self._target[key]
-        else:
-            raise self._error(key)
+            return True
+        return False
 
 
 class ChainContext(Context):
@@ -116,34 +228,64 @@ class ChainContext(Context):
     Chain multiple #Context implementations.
     """
 
+    __slots__ = ("_contexts", "_num_contexts", "_ctx0", "_ctx1", "_ctx2")
+
     def __init__(self, *contexts: Context) -> None:
-        self._contexts = contexts
+        # Nested chains are flattened so that name resolution is a single linear scan.
+        self._contexts: t.Tuple[Context, ...] = tuple(
+            sub_ctx
+            for ctx in contexts
+            for sub_ctx in (ctx._contexts if isinstance(ctx, ChainContext) else (_as_context(ctx),))
+        )
+
+        # Chains are usually short; #_try_get() has an unrolled code path for up to three contexts.
+        self._num_contexts = len(self._contexts)
+        padded: t.Tuple[t.Any, ...] = self._contexts + (None, None, None)
+        self._ctx0, self._ctx1, self._ctx2 = padded[:3]
 
     def __getitem__(self, key: str) -> t.Any:
+        value = self._try_get(key)
+        if value is undefined:
+            raise NameError(key)
+        return value
+
+    def _try_get(self, key: str) -> t.Any:
+        num_contexts = self._num_contexts
+        if num_contexts <= 3:
+            if num_contexts == 0:
+                return undefined
+            value = self._ctx0._try_get(key)
+            if value is not undefined or num_contexts == 1:
+                return value
+            value = self._ctx1._try_get(key)
+            if value is not undefined or num_contexts == 2:
+                return value
+            return self._ctx2._try_get(key)
         for ctx in self._contexts:
-            try:
-                return ctx[key]
-            except NameError:
-                pass
-        raise NameError(key)
+            value = ctx._try_get(key)
+            if value is not undefined:
+                return value
+        return undefined
 
     def __setitem__(self, key: str, value: t.Any) -> None:
+        if not self._try_set(key, value):
+            raise NameError(key)
+
+    def _try_set(self, key: str, value: t.Any) -> bool:
         for ctx in self._contexts:
-            try:
-                ctx[key] = value
-                return
-            except NameError:
-                pass
-        raise NameError(key)
+            if ctx._try_set(key, value):
+                return True
+        return False
 
     def __delitem__(self, key: str) -> None:
+        if not self._try_del(key):
+            raise NameError(key)
+
+    def _try_del(self, key: str) -> bool:
         for ctx in self._contexts:
-            try:
-                del ctx[key]
-                return
-            except NameError:
-                pass
-        raise NameError(key)
+            if ctx._try_del(key):
+                return True
+        return False
 
     def chain_with(self, other: Context) -> "ChainContext":
         return ChainContext(*self._contexts, other)
@@ -166,6 +308,8 @@ class Closure(Context):
     apply changes to the locals in a function. This is handled by proper rewriting rules in the #NameRewriter.
     """
 
+    __slots__ = ("_parent", "frame", "_target", "_target_context", "_context_factory")
+
     @staticmethod
     def init_options(options: TranspileOptions) -> None:
         options.closure_target = "__closure__"
@@ -174,10 +318,7 @@ class Closure(Context):
 
     @staticmethod
     def get_options() -> TranspileOptions:
-        options = TranspileOptions()
-        Closure.init_options(options)
-        options.sync()
-        return options
+        return _DEFAULT_CLOSURE_OPTIONS.copy()
 
     def __init__(
         self,
@@ -199,28 +340,21 @@ class Closure(Context):
         """
 
         self._parent = parent
-        self._frame = frame  # weakref.ref(frame) if frame else None  # NOTE (@NiklasRosenstein): Cannot create weakref to frame  # noqa: E501
+        self.frame = frame  # weakref.ref(frame) if frame else None  # NOTE (@NiklasRosenstein): Cannot create weakref to frame  # noqa: E501
         self._target = target
-        self._target_context = (
-            (context_factory(target) if target is not None else None) if target_context is None else target_context
-        )
+        if target_context is None and target is not None:
+            target_context = context_factory(target)
+        self._target_context = _as_context(target_context) if target_context is not None else None
         self._context_factory = context_factory
 
     def __repr__(self) -> str:
         return f"Closure(target={self._target!r})"
 
-    @property
-    def frame(self) -> t.Optional[types.FrameType]:
-        return self._frame
-
     def subclosure(self, func: t.Callable[..., t.Any], frame: t.Optional[types.FrameType] = None) -> "UnboundClosure":
-        if frame is None:
-            frame = sys._getframe(1)
-
-        closure = UnboundClosure(self, frame, func)
-        del frame
-
-        return closure
+        # NOTE: The frame must be the one in which *func* is defined, as that is where the closure's local
+        #       variables live. It differs for every invocation of the enclosing function, so it cannot be
+        #       looked up once and reused.
+        return UnboundClosure(self, _getframe(1) if frame is None else frame, func)
 
     def run_code(
         self,
@@ -231,13 +365,19 @@ class Closure(Context):
     ) -> None:
         """
         Executes the given BuildDSL *code* with the #Closure as it's entry `__closure__` object.
+
+        The compiled code is cached in memory. If *filename* names an existing file, it is also cached on disk
+        in the directory specified by the `BUILDDSL_CACHE_DIR` environment variable, which defaults to
+        `~/.cache/builddsl` (respecting `XDG_CACHE_HOME`). Set the variable to an empty string to disable the
+        on-disk cache. Only the 256 most recently used entries are kept.
         """
 
         if options:
             Closure.init_options(options)
+            options_key = options.freeze()
         else:
-            options = Closure.get_options()
-        module = compile(transpile_to_ast(code, filename, options), filename, "exec")
+            options, options_key = _DEFAULT_CLOSURE_OPTIONS, _DEFAULT_CLOSURE_OPTIONS_KEY
+        module = _compile_dsl(code, filename, options_key)
         if scope is None:
             scope = {}
         assert options.closure_target
@@ -245,69 +385,186 @@ class Closure(Context):
         exec(module, scope)
 
     def __getitem__(self, key: str) -> t.Any:
-        frame = self.frame
-        if frame and key in frame.f_locals:
-            return frame.f_locals[key]
-        if self._target_context is not None:
-            try:
-                return self._target_context[key]
-            except NameError:
-                pass
-        if self._parent is not None:
-            try:
-                return self._parent[key]
-            except NameError:
-                pass
-        if hasattr(builtins, key):
-            return getattr(builtins, key)
-        raise NameError(f"{key!r} in {self!r}")
+        value = self._try_get(key)
+        if value is undefined:
+            raise NameError(f"{key!r} in {self!r}")
+        return value
+
+    def _try_get(self, key: str) -> t.Any:
+        frame, target_context, parent = self.frame, self._target_context, self._parent
+        # NOTE: Accessing #types.FrameType.f_locals synchronizes the frame's fast locals into a dictionary,
+        #       so we only want to do that once.
+        if frame is not None:
+            value = frame.f_locals.get(key, undefined)
+            if value is not undefined:
+                return value
+        if target_context is not None:
+            value = target_context._try_get(key)
+            if value is not undefined:
+                return value
+        if parent is not None:
+            value = parent._try_get(key)
+            if value is not undefined:
+                return value
+        return _BUILTINS.get(key, undefined)
 
     def __setitem__(self, key: str, value: t.Any) -> None:
-        frame = self.frame
-        if frame and key in frame.f_locals:
+        if not self._try_set(key, value):
+            raise NameError(f"unclear where to set {key!r}")
+
+    def _try_set(self, key: str, value: t.Any) -> bool:
+        frame, target_context, parent = self.frame, self._target_context, self._parent
+        if frame is not None and key in frame.f_locals:
             raise RuntimeError("cannot set local variable through context, this should be handled by the transpiler")
-        if self._target_context is not None:
-            try:
-                self._target_context[key] = value
-                return
-            except NameError:
-                pass
-        if self._parent is not None:
-            try:
-                self._parent[key] = value
-                return
-            except NameError:
-                pass
-        raise NameError(f"unclear where to set {key!r}")
+        if target_context is not None and target_context._try_set(key, value):
+            return True
+        if parent is not None and parent._try_set(key, value):
+            return True
+        return False
 
     def __delitem__(self, key: str) -> None:
-        frame = self.frame
-        if frame and key in frame.f_locals:
+        if not self._try_del(key):
+            raise NameError(f"unclear where to delete {key!r}")
+
+    def _try_del(self, key: str) -> bool:
+        frame, target_context, parent = self.frame, self._target_context, self._parent
+        if frame is not None and key in frame.f_locals:
             raise RuntimeError("cannot delete local variable through context, this should be handled by the transpiler")
-        if self._target_context is not None:
-            try:
-                del self._target_context[key]
-                return
-            except NameError:
-                pass
-        if self._parent is not None:
-            try:
-                del self._parent[key]
-                return
-            except NameError:
-                pass
-        raise NameError(f"unclear where to delete {key!r}")
+        if target_context is not None and target_context._try_del(key):
+            return True
+        if parent is not None and parent._try_del(key):
+            return True
+        return False
 
     @staticmethod
     def from_map(m: t.MutableMapping[str, t.Any]) -> "Closure":
         return Closure(None, None, m, ObjectContext, MapContext(m, "Closure.from_map()"))
 
 
-@dataclass
+def _make_default_closure_options() -> TranspileOptions:
+    options = TranspileOptions()
+    Closure.init_options(options)
+    options.sync()
+    return options
+
+
+#: The #TranspileOptions used by #Closure.run_code() if no options are passed. This object must not be mutated;
+#: use #Closure.get_options() to get a copy of it.
+_DEFAULT_CLOSURE_OPTIONS = _make_default_closure_options()
+_DEFAULT_CLOSURE_OPTIONS_KEY = _DEFAULT_CLOSURE_OPTIONS.freeze()
+
+
+#: The maximum number of compiled code objects kept in the on-disk cache. When more entries are stored, the least
+#: recently used ones are removed.
+_DISK_CACHE_MAX_ENTRIES = 256
+
+
+def _get_cache_dir() -> t.Optional[str]:
+    """
+    Returns the directory for the on-disk cache of compiled BuildDSL code, or `None` if it is disabled.
+    """
+
+    cache_dir = os.getenv("BUILDDSL_CACHE_DIR")
+    if cache_dir is None:
+        cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(cache_home, "builddsl")
+    return cache_dir or None
+
+
+def _load_cached_code(path: str) -> t.Optional[types.CodeType]:
+    try:
+        with open(path, "rb") as fp:
+            code = marshal.load(fp)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(code, types.CodeType):
+        return None
+    # Update the modification time, which is what #_prune_cache() uses to find least recently used entries.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return code
+
+
+def _store_cached_code(path: str, code: types.CodeType) -> None:
+    # Write to a temporary file first so that concurrent processes never read a partially written file.
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                marshal.dump(code, fp)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    except OSError:
+        pass
+
+
+def _prune_cache(cache_dir: str, max_entries: int) -> None:
+    """
+    Removes the least recently used entries from the on-disk cache until at most *max_entries* remain.
+    """
+
+    try:
+        entries = [
+            (entry.stat().st_mtime, entry.path) for entry in os.scandir(cache_dir) if entry.name.endswith(".pyc")
+        ]
+    except OSError:
+        return
+    entries.sort()
+    for _, path in entries[: max(len(entries) - max_entries, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_dsl(code: str, filename: str, options_key: t.Tuple[t.Any, ...]) -> types.CodeType:
+    """
+    Transpiles and compiles BuildDSL *code*. The result is cached, so executing the same code with the same
+    options again (as identified by the #TranspileOptions.freeze() snapshot in *options_key*) skips the work.
+    If *filename* names an existing file, compiled code objects are also persisted in the directory returned by
+    #_get_cache_dir() so that the work can be skipped across processes. Code that does not come from a file
+    (e.g. snippets run with the default `<string>` filename) is never written to disk.
+    """
+
+    from . import __version__
+
+    cache_dir = _get_cache_dir()
+    cache_file = None
+    if cache_dir is not None and os.path.isfile(filename):
+        # The Python bytecode magic number and the BuildDSL version are part of the key because code objects
+        # are not portable across Python versions, and the transpiler output may change between releases.
+        hasher = hashlib.sha1()
+        for part in (importlib.util.MAGIC_NUMBER.hex(), __version__, filename, repr(options_key), code):
+            hasher.update(part.encode("utf8", "surrogatepass") + b"\0")
+        cache_file = os.path.join(cache_dir, hasher.hexdigest() + ".pyc")
+        cached = _load_cached_code(cache_file)
+        if cached is not None:
+            return cached
+
+    compiled = compile(transpile_to_ast(code, filename, TranspileOptions.thaw(options_key)), filename, "exec")
+    if cache_dir is not None and cache_file is not None:
+        _store_cached_code(cache_file, compiled)
+        _prune_cache(cache_dir, _DISK_CACHE_MAX_ENTRIES)
+    return compiled
+
+
 class UnboundClosure:
-    parent: Closure
-    frame: types.FrameType
-    func: t.Callable[..., t.Any]
+    """
+    A closure function that is bound to a #Closure when it is called. Returned by #Closure.subclosure().
+    """
+
+    __slots__ = ("parent", "frame", "func")
+
+    def __init__(self, parent: Closure, frame: types.FrameType, func: t.Callable[..., t.Any]) -> None:
+        self.parent = parent
+        self.frame = frame
+        self.func = func
 
     def __call__(self, *args: t.Any, **kwargs: t.Any) -> t.Any:
         __closure__ = Closure(self.parent, self.frame, args[0] if args else None, self.parent._context_factory)
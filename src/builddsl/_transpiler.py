@@ -6,7 +6,7 @@ import ast
 import logging
 import sys
 import typing as t
-from dataclasses import dataclass, field
+from dataclasses import astuple, dataclass, field, replace
 
 from ._rewriter import Closure, Grammar, Rewriter
 from .ast_utils import DynamicLookupRewriter
@@ -58,6 +58,35 @@ class TranspileOptions:
         self.grammar.local_def = self.closure_target is not None
         self.grammar.local_prefix = self.local_vardef_prefix
 
+    def copy(self) -> "TranspileOptions":
+        """Returns a copy of the options that can be modified independently, including the #grammar."""
+
+        return replace(self, grammar=replace(self.grammar))
+
+    def freeze(self) -> t.Tuple[t.Any, ...]:
+        """Returns a hashable snapshot of the options, e.g. for use as a cache key. The snapshot can be
+        converted back to a #TranspileOptions object with #thaw()."""
+
+        return (
+            self.closure_target,
+            tuple(sorted(self.pure_builtins)),
+            self.local_vardef_prefix,
+            self.preamble,
+            self.closure_def_prefix,
+            self.closure_default_arglist,
+            self.closure_arglist_prefix,
+            astuple(self.grammar),
+        )
+
+    @staticmethod
+    def thaw(frozen: t.Tuple[t.Any, ...]) -> "TranspileOptions":
+        """Create a #TranspileOptions object from a snapshot created with #freeze()."""
+
+        *values, grammar = frozen
+        options = TranspileOptions(*values)
+        options.grammar = Grammar(*grammar)
+        return options
+
 
 def transpile_to_ast(code: str, filename: str, options: t.Optional[TranspileOptions] = None) -> ast.Module:
     """
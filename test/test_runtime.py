@@ -1,8 +1,10 @@
+import sys
 from types import SimpleNamespace
 
+import builddsl._runtime
 import pytest
-from builddsl._runtime import Closure
-from builddsl._transpiler import transpile_to_source
+from builddsl._runtime import ChainContext, Closure, Context, MapContext, ObjectContext, _compile_dsl
+from builddsl._transpiler import TranspileOptions, transpile_to_source
 
 code = """
 task "foobar" do: {
@@ -21,6 +23,35 @@ task "cheeky" do: {
 """
 
 
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+  monkeypatch.setenv('BUILDDSL_CACHE_DIR', str(tmp_path / 'cache'))
+  _compile_dsl.cache_clear()
+  return tmp_path / 'cache'
+
+
+class DuckContext:
+  """ A context that implements the #Context protocol without subclassing it. """
+
+  def __init__(self, **values):
+    self.values = values
+
+  def __getitem__(self, key):
+    if key in self.values:
+      return self.values[key]
+    raise NameError(key)
+
+  def __setitem__(self, key, value):
+    if key not in self.values:
+      raise NameError(key)
+    self.values[key] = value
+
+  def __delitem__(self, key):
+    if key not in self.values:
+      raise NameError(key)
+    del self.values[key]
+
+
 class Project:
 
   def __init__(self):
@@ -55,3 +86,279 @@ def test_closure_bad_delete():
   with pytest.raises(NameError) as excinfo:
     Closure(None, None, None).run_code('del foobar', '<string>')
   assert str(excinfo.value) == "unclear where to delete 'foobar'"
+
+
+def test_object_context_prevents_overwriting_methods():
+  project = Project()
+  context = ObjectContext(project)
+  context['n_times'] = 5
+  assert project.n_times == 5
+  with pytest.raises(RuntimeError) as excinfo:
+    context['task'] = None
+  assert str(excinfo.value) == "cannot overwrite method Project.task()"
+  with pytest.raises(NameError):
+    context['foobar'] = 42
+
+
+def test_get_options_returns_independent_copies():
+  options = Closure.get_options()
+  assert options.closure_target == '__closure__'
+  assert options.grammar.local_def
+  options.closure_target = None
+  options.grammar.local_def = False
+  assert Closure.get_options().closure_target == '__closure__'
+  assert Closure.get_options().grammar.local_def
+
+
+def test_run_code_reuses_compiled_code():
+  closure = Closure.from_map({'value': 0})
+  code = 'value = value + 1\n'
+  closure.run_code(code)
+  closure.run_code(code)
+  assert closure['value'] == 2
+  assert _compile_dsl.cache_info().hits == 1
+  assert _compile_dsl.cache_info().misses == 1
+
+
+def test_transpile_options_freeze_and_thaw():
+  options = Closure.get_options()
+  options.pure_builtins = {'foo'}
+  frozen = options.freeze()
+  assert hash(frozen) == hash(TranspileOptions.thaw(frozen).freeze())
+  assert TranspileOptions.thaw(frozen) == TranspileOptions(**{**vars(options), 'pure_builtins': ('foo',)})
+
+
+def test_chain_context():
+  project = Project()
+  data = {'foo': 1}
+  context = ObjectContext(project).chain_with(MapContext(data, 'data'))
+  assert context['n_times'] == 10
+  assert context['foo'] == 1
+  context['foo'] = 2
+  assert data['foo'] == 2
+  del context['foo']
+  assert data == {}
+  with pytest.raises(NameError):
+    context['foo']
+  with pytest.raises(NameError):
+    context['foo'] = 3
+
+
+def test_chain_context_is_flattened():
+  a, b, c = MapContext({'a': 1}, 'a'), MapContext({'b': 2}, 'b'), MapContext({'c': 3}, 'c')
+  context = ChainContext(a.chain_with(b), c)
+  assert context._contexts == (a, b, c)
+  assert context['a'] == 1 and context['c'] == 3
+
+
+def test_object_context_respects_data_descriptors_and_custom_getattribute():
+  class WithProperty:
+    @property
+    def value(self):
+      return 'property'
+
+  class WithGetattribute:
+    def __getattribute__(self, key):
+      return 'getattribute'
+
+  obj = WithProperty()
+  obj.__dict__['value'] = 'instance'
+  assert ObjectContext(obj)['value'] == 'property'
+
+  obj = WithGetattribute()
+  object.__setattr__(obj, 'value', 'instance')
+  assert ObjectContext(obj)['value'] == 'getattribute'
+
+
+def test_object_context_set_respects_setattr_and_descriptors():
+  class WithSetter:
+    def __init__(self):
+      self._value = None
+      self.other = None
+
+    @property
+    def value(self):
+      return self._value
+
+    @value.setter
+    def value(self, value):
+      self._value = value
+
+  class WithSetattr:
+    value = None
+
+    def __setattr__(self, key, value):
+      object.__setattr__(self, key, value * 2)
+
+  obj = WithSetter()
+  ObjectContext(obj)['value'] = 42
+  ObjectContext(obj)['other'] = 43
+  assert obj._value == 42 and obj.other == 43
+
+  obj = WithSetattr()
+  ObjectContext(obj)['value'] = 21
+  assert obj.value == 42
+
+
+def test_closure_resolves_builtins():
+  closure = Closure(None, None, Project())
+  assert closure['len'] is len
+  assert closure['print'] is print
+  with pytest.raises(NameError):
+    closure['not_a_builtin']
+
+
+def test_run_code_reuses_compiled_code_from_disk(cache_dir, tmp_path, monkeypatch):
+  code = 'value = value + 1\n'
+  filename = tmp_path / 'build.dsl'
+  filename.write_text(code)
+  closure = Closure.from_map({'value': 0})
+  closure.run_code(code, str(filename))
+  assert len(list(cache_dir.glob('*.pyc'))) == 1
+
+  def _transpile_to_ast(*args):
+    raise AssertionError('code should have been loaded from the cache')
+
+  _compile_dsl.cache_clear()
+  monkeypatch.setattr(builddsl._runtime, 'transpile_to_ast', _transpile_to_ast)
+  closure.run_code(code, str(filename))
+  assert closure['value'] == 2
+
+
+def test_run_code_does_not_cache_code_without_file_on_disk(cache_dir):
+  Closure.from_map({'value': 0}).run_code('value = 1\n')
+  assert not cache_dir.exists()
+
+
+def test_run_code_without_disk_cache(cache_dir, tmp_path, monkeypatch):
+  monkeypatch.setenv('BUILDDSL_CACHE_DIR', '')
+  filename = tmp_path / 'build.dsl'
+  filename.write_text('value = 1\n')
+  Closure.from_map({'value': 0}).run_code(filename.read_text(), str(filename))
+  assert not cache_dir.exists()
+
+
+def test_disk_cache_is_pruned(cache_dir, tmp_path, monkeypatch):
+  monkeypatch.setattr(builddsl._runtime, '_DISK_CACHE_MAX_ENTRIES', 2)
+  filename = tmp_path / 'build.dsl'
+  for i in range(4):
+    filename.write_text(f'value = {i}\n')
+    Closure.from_map({'value': 0}).run_code(filename.read_text(), str(filename))
+  assert len(list(cache_dir.glob('*.pyc'))) == 2
+
+
+def test_chain_context_with_custom_context():
+  class UpperContext(Context):
+    def __getitem__(self, key):
+      if key.isupper():
+        return key.lower()
+      raise NameError(key)
+
+  context = ChainContext(UpperContext(), MapContext({'foo': 1}, 'data'))
+  assert context['FOO'] == 'foo'
+  assert context['foo'] == 1
+  assert context['BAR'] == 'bar'
+  with pytest.raises(NameError):
+    context['bar']
+
+
+def test_object_context_prevents_deleting_class_methods():
+  class Target:
+    @classmethod
+    def create(cls):
+      return cls()
+
+    def build(self):
+      pass
+
+  context = ObjectContext(Target())
+  with pytest.raises(RuntimeError):
+    del context['create']
+  with pytest.raises(RuntimeError):
+    del context['build']
+
+
+@pytest.mark.parametrize('num_contexts', [0, 1, 2, 3, 4, 5])
+def test_chain_context_lengths(num_contexts):
+  context = ChainContext(*(MapContext({f'v{i}': i}, f'v{i}') for i in range(num_contexts)))
+  for i in range(num_contexts):
+    assert context[f'v{i}'] == i
+  with pytest.raises(NameError):
+    context['missing']
+
+
+def test_closure_frame_attribute():
+  frame = sys._getframe()
+  assert Closure(None, frame).frame is frame
+  assert Closure().frame is None
+
+
+def test_duck_typed_contexts():
+  duck = DuckContext(foo=1, bar=2)
+  context = ChainContext(duck, MapContext({'baz': 3}, 'data'))
+  assert context['foo'] == 1
+  assert context['baz'] == 3
+  context['bar'] = 4
+  assert duck.values['bar'] == 4
+  del context['foo']
+  assert 'foo' not in duck.values
+  with pytest.raises(NameError):
+    context['foo']
+
+  closure = Closure(None, None, target_context=DuckContext(foo=1))
+  assert closure['foo'] == 1
+  closure['foo'] = 2
+  assert closure['foo'] == 2
+  del closure['foo']
+  with pytest.raises(NameError):
+    closure['foo']
+
+
+def test_object_context_sees_later_class_changes():
+  class Target:
+    pass
+
+  obj = Target()
+  obj.__dict__['value'] = 1
+  assert ObjectContext(obj)['value'] == 1
+  Target.value = property(lambda self: 'property')
+  assert ObjectContext(obj)['value'] == 'property'
+
+  Target.method = lambda self: None
+  with pytest.raises(RuntimeError):
+    ObjectContext(obj)['method'] = None
+  del Target.method
+  obj.method = 'attribute'
+  ObjectContext(obj)['method'] = 'changed'
+  assert obj.method == 'changed'
+
+
+def test_object_context_instance_attribute_shadows_method():
+  class Target:
+    def __init__(self):
+      self.name = 'x'
+
+    def name(self):
+      pass
+
+  obj = Target()
+  context = ObjectContext(obj)
+  assert context['name'] == 'x'
+  context['name'] = 'y'
+  assert obj.name == 'y'
+  del context['name']
+  with pytest.raises(RuntimeError):
+    context['name'] = 'z'
+
+
+def test_duck_typed_context_with_getattr():
+  class ProxyContext(DuckContext):
+    def __getattr__(self, key):
+      return lambda *args: 'proxied'
+
+  context = ChainContext(ProxyContext(foo=1), MapContext({'bar': 2}, 'data'))
+  assert context['foo'] == 1
+  assert context['bar'] == 2
+  closure = Closure(None, None, target_context=ProxyContext(foo=1))
+  assert closure['foo'] == 1
+  assert closure['len'] is len